@@ -1,10 +1,22 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
-from urllib.parse import urljoin, urlparse
+import httpx
+from lxml import etree
+import io
+import os
+import json
+import hashlib
+import tempfile
+import gzip
+import zlib
+import re
+import time
+from urllib.parse import urljoin
 import pandas as pd
-from datetime import datetime
+import asyncio
+import threading
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Configuração da página
 st.set_page_config(page_title="SEO Analyzer Pro", page_icon="🔍", layout="wide")
@@ -19,23 +31,340 @@ Esta ferramenta analisa arquivos sitemap.xml e robots.txt de sites, incluindo:
 - Diagnóstico completo de bloqueios e estrutura
 """)
 
+st.sidebar.header("Configurações")
+max_urls = st.sidebar.slider(
+    "Limite de URLs na análise de sitemaps index",
+    min_value=10_000, max_value=1_000_000, value=200_000, step=10_000
+)
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+URLSET_TAG = SITEMAP_NS + 'urlset'
+SITEMAPINDEX_TAG = SITEMAP_NS + 'sitemapindex'
+URL_TAG = SITEMAP_NS + 'url'
+SITEMAP_TAG = SITEMAP_NS + 'sitemap'
+LOC_TAG = SITEMAP_NS + 'loc'
+LASTMOD_TAG = SITEMAP_NS + 'lastmod'
+CHANGEFREQ_TAG = SITEMAP_NS + 'changefreq'
+PRIORITY_TAG = SITEMAP_NS + 'priority'
+SITEMAP_FIELDS = ['loc', 'lastmod', 'changefreq', 'priority']
+URL_COLUMNS = itemgetter(*SITEMAP_FIELDS)
+# Strings Arrow e categorias ocupam bem menos memória que colunas de objetos Python
+SITEMAP_DTYPES = {
+    'loc': 'string[pyarrow]',
+    'lastmod': 'string[pyarrow]',
+    'changefreq': 'category',
+    'priority': 'float32'
+}
+
+IMPORTANT_PATHS = ['/css/', '/js/', '/img/', '/assets/']
+# Lookahead para encontrar ocorrências sobrepostas (ex.: /css/js/) em uma única varredura
+IMPORTANT_PATHS_RE = re.compile('(?=(' + '|'.join(map(re.escape, IMPORTANT_PATHS)) + '))')
+
+USER_AGENT = "CrawlMagnet/1.0 (+https://github.com/gbernardojr/crawlmagnet)"
+
+DEFAULT_HEADERS = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate'}
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=16)
+# Timeout curto de conexão separado do de leitura: hosts fora do ar falham rápido
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
+HTTP_RETRIES = 2
+
+# Cliente HTTP/2 compartilhado: requisições ao mesmo host são multiplexadas em uma conexão.
+# O cache_resource mantém o mesmo cliente (e o pool de conexões) entre os reruns do Streamlit
+@st.cache_resource
+def get_http_client():
+    transport = httpx.HTTPTransport(http2=True, limits=HTTP_LIMITS, retries=HTTP_RETRIES)
+    return httpx.Client(transport=transport, headers=DEFAULT_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True)
+
+SESSION = get_http_client()
+
+CACHE_DIR = '.crawlmagnet_cache'
+# Respostas válidas ficam 6h no cache; falhas só 5 min, para o endpoint ser tentado de novo
+CACHE_TTL = 6 * 3600
+NEGATIVE_CACHE_TTL = 300
+# Teto do cache em disco; acima dele os corpos menos usados recentemente saem primeiro
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Mesmo limite do Google: o que passar de 500KB no robots.txt é ignorado
+ROBOTS_MAX_BYTES = 500 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+URL_RE = re.compile(r'^https?://[^/\s]+', re.IGNORECASE)
+
 def is_valid_url(url):
+    return bool(URL_RE.match(url))
+
+# Cache em disco endereçado pelo hash da URL, revalidado com ETag/Last-Modified
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    base = os.path.join(CACHE_DIR, key)
+    return base + '.bin', base + '.json'
+
+def _conditional_headers(url):
+    body_path, meta_path = _cache_paths(url)
+    if not os.path.exists(body_path):
+        return {}
     try:
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
-    except:
-        return False
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
 
-def fetch_robots_txt(base_url):
-    robots_url = urljoin(base_url, '/robots.txt')
+def _touch_cached(body_path):
+    # Um 304 confirma a cópia: ela volta a contar como recente para o TTL e a limpeza por tamanho
+    try:
+        os.utime(body_path)
+    except OSError:
+        pass
+
+def _read_cached(url):
+    body_path, _ = _cache_paths(url)
+    _touch_cached(body_path)
+    try:
+        with open(body_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _store_cached_meta(url, headers):
+    _, meta_path = _cache_paths(url)
+    meta = {
+        'url': url,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified')
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def _store_cached(url, content, headers):
+    cache = _CacheFile(url, headers)
+    cache.write(content)
+    cache.commit()
+
+def _open_cached(url):
+    body_path, _ = _cache_paths(url)
+    _touch_cached(body_path)
+    try:
+        return open(body_path, 'rb')
+    except OSError:
+        return None
+
+def _sweep_cache():
+    # Remove o que passou do CACHE_TTL e, acima de CACHE_MAX_BYTES, os corpos mais antigos primeiro.
+    # .tmp recentes são downloads em andamento e ficam; os velhos são restos de downloads interrompidos
+    try:
+        entries = []
+        for entry in os.scandir(CACHE_DIR):
+            if entry.name.endswith(('.bin', '.tmp')):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+    
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        expired = now - mtime > CACHE_TTL
+        if not expired and (total <= CACHE_MAX_BYTES or path.endswith('.tmp')):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            if path.endswith('.bin'):
+                os.remove(path[:-len('.bin')] + '.json')
+        except OSError:
+            pass
+
+class _CacheFile:
+    # Grava o corpo em um .tmp conforme ele chega e só o publica no cache quando o download termina.
+    # Cada download tem seu próprio .tmp, para que buscas simultâneas da mesma URL não se misturem.
+    # Sem ETag nem Last-Modified a cópia nunca poderia ser revalidada, então nem é gravada
+    def __init__(self, url, headers):
+        self.url = url
+        self.headers = headers
+        self.body_path, _ = _cache_paths(url)
+        self.file = None
+        if not (headers.get('ETag') or headers.get('Last-Modified')):
+            return
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, self.tmp_path = tempfile.mkstemp(suffix='.tmp', dir=CACHE_DIR)
+            self.file = os.fdopen(fd, 'wb')
+        except OSError:
+            self.file = None
+    
+    def write(self, chunk):
+        if self.file:
+            self.file.write(chunk)
+    
+    def commit(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            try:
+                os.replace(self.tmp_path, self.body_path)
+                _store_cached_meta(self.url, self.headers)
+            except OSError:
+                pass
+            _sweep_cache()
+    
+    def discard(self):
+        # Download incompleto não deve ficar no cache
+        if self.file:
+            self.file.close()
+            self.file = None
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+
+class _ProbeCancelled(Exception):
+    # Outro candidato já venceu a sondagem; o download em andamento é abandonado
+    pass
+
+class _CachingReader(io.RawIOBase):
+    # Entrega o corpo da resposta ao parser aos poucos, gravando uma cópia no cache em disco
+    def __init__(self, url, response, cancelled=None):
+        super().__init__()
+        self.response = response
+        self.chunks = response.iter_bytes()
+        self.pending = b''
+        self.cache = _CacheFile(url, response.headers)
+        self.cancelled = cancelled
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise _ProbeCancelled()
+        if not self.pending:
+            self.pending = next(self.chunks, b'')
+        chunk, self.pending = self.pending[:len(buffer)], self.pending[len(buffer):]
+        if chunk:
+            self.cache.write(chunk)
+        else:
+            self.cache.commit()
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+    
+    def close(self):
+        self.cache.discard()
+        self.response.close()
+        super().close()
+
+def _read_limited(response, max_bytes):
+    # Para de ler assim que o limite é atingido; o resto do corpo nem é baixado
+    if max_bytes is None:
+        return response.read()
+    chunks, size = [], 0
+    for chunk in response.iter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+    return b''.join(chunks)[:max_bytes]
+
+def cached_get(url, max_bytes=None, reject_types=(), reject_markup=False):
+    request = SESSION.build_request('GET', url, headers=_conditional_headers(url))
+    response = SESSION.send(request, stream=True)
     try:
-        response = requests.get(robots_url, timeout=10)
+        if response.status_code == 304:
+            return _read_cached(url)
         if response.status_code == 200:
-            return response.text
+            # Content-Types recusados são descartados sem baixar o corpo
+            if response.headers.get('Content-Type', '').lower().startswith(reject_types):
+                return None
+            content = _read_limited(response, max_bytes)
+            # Corpo que começa com '<' é HTML/XML no lugar de texto: recusado antes de ir para o cache
+            if reject_markup and content.lstrip()[:1] == b'<':
+                return None
+            _store_cached(url, content, response.headers)
+            return content
         return None
+    finally:
+        response.close()
+
+def _with_negative_ttl(cached_func, *args):
+    # As funções cacheadas devolvem (instante da busca, resultado); um None antigo é descartado e buscado de novo
+    fetched_at, result = cached_func(*args)
+    if result is None and time.time() - fetched_at > NEGATIVE_CACHE_TTL:
+        cached_func.clear(*args)
+        fetched_at, result = cached_func(*args)
+    return result
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=128, show_spinner=False)
+def _fetch_robots_txt(base_url):
+    robots_url = urljoin(base_url, '/robots.txt')
+    try:
+        # Um byte além do limite basta para saber se o arquivo foi cortado
+        # Muitos sites devolvem uma página HTML no lugar do robots.txt; não há regra a extrair dela
+        content = cached_get(robots_url, max_bytes=ROBOTS_MAX_BYTES + 1, reject_types=('text/html',), reject_markup=True)
+        if content:
+            if len(content) > ROBOTS_MAX_BYTES:
+                st.warning(f"robots.txt maior que {ROBOTS_MAX_BYTES // 1024}KB; apenas o início foi analisado")
+                content = content[:ROBOTS_MAX_BYTES]
+            return time.time(), content.decode('utf-8', errors='replace')
+        return time.time(), None
     except:
-        return None
+        return time.time(), None
+
+def fetch_robots_txt(base_url):
+    return _with_negative_ttl(_fetch_robots_txt, base_url)
+
+# O grupo atual é uma lista enquanto só recebeu User-agent (RFC 9309: linhas consecutivas
+# formam um único grupo); a primeira regra o fecha como tupla e o próximo User-agent abre outro
+def _handle_user_agent(data, group, value):
+    if value not in data['user_agents']:
+        data['user_agents'][value] = {'disallow': [], 'allow': []}
+    if isinstance(group, list):
+        group.append(value)
+        return group
+    return [value]
+
+def _handle_disallow(data, group, value):
+    if value and group:
+        for ua in group:
+            data['user_agents'][ua]['disallow'].append(value)
+    return tuple(group)
+
+def _handle_allow(data, group, value):
+    if value and group:
+        for ua in group:
+            data['user_agents'][ua]['allow'].append(value)
+    return tuple(group)
+
+def _handle_sitemap(data, group, value):
+    # Sitemap não pertence a nenhum grupo
+    data['sitemaps'].append(value)
+    return group
+
+def _handle_crawl_delay(data, group, value):
+    data['crawl_delay'] = value
+    return tuple(group)
 
+ROBOTS_HANDLERS = {
+    'user-agent': _handle_user_agent,
+    'disallow': _handle_disallow,
+    'allow': _handle_allow,
+    'sitemap': _handle_sitemap,
+    'crawl-delay': _handle_crawl_delay
+}
+
+# Uma varredura em C sobre o arquivo inteiro: comentários ou diretivas conhecidas, já sem espaços
+# e sem o comentário que venha depois do valor. Valor e comentário terminam sempre em um caractere
+# visível, então nenhum espaço pode ser disputado entre dois grupos (o que levaria a backtracking)
+ROBOTS_LINE_RE = re.compile(
+    r'^[ \t]*(?:#[ \t]*(?P<comment>[^\r\n]*[^\s]|)|(?P<key>' + '|'.join(map(re.escape, ROBOTS_HANDLERS)) + r')[ \t]*:[ \t]*(?P<value>[^#\r\n]*[^\s#]|)[ \t]*(?:#[^\r\n]*)?)[ \t\r]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=128, show_spinner=False)
 def parse_robots_txt(content):
     if not content:
         return None
@@ -43,151 +372,258 @@ def parse_robots_txt(content):
     data = {
         'user_agents': {},
         'sitemaps': [],
-        'disallowed': [],
-        'allowed': [],
         'crawl_delay': None,
         'comments': []
     }
     
-    current_ua = '*'
+    # Regras antes de qualquer User-agent não pertencem a grupo algum
+    group = ()
     
-    for line in content.split('\n'):
-        line = line.strip()
-        
-        if not line:
-            continue
-            
-        if line.startswith('#'):
-            data['comments'].append(line[1:].strip())
-            continue
-            
-        if line.lower().startswith('user-agent:'):
-            current_ua = line[11:].strip()
-            if current_ua not in data['user_agents']:
-                data['user_agents'][current_ua] = {'disallow': [], 'allow': []}
-            continue
-            
-        if line.lower().startswith('disallow:'):
-            path = line[9:].strip()
-            if path and current_ua in data['user_agents']:
-                data['user_agents'][current_ua]['disallow'].append(path)
-                data['disallowed'].append(path)
-            continue
-            
-        if line.lower().startswith('allow:'):
-            path = line[6:].strip()
-            if path and current_ua in data['user_agents']:
-                data['user_agents'][current_ua]['allow'].append(path)
-                data['allowed'].append(path)
-            continue
-            
-        if line.lower().startswith('sitemap:'):
-            sitemap_url = line[8:].strip()
-            data['sitemaps'].append(sitemap_url)
-            continue
-            
-        if line.lower().startswith('crawl-delay:'):
-            delay = line[12:].strip()
-            data['crawl_delay'] = delay
-            continue
+    for match in ROBOTS_LINE_RE.finditer(content):
+        key = match.group('key')
+        if key is None:
+            data['comments'].append(match.group('comment'))
+        else:
+            group = ROBOTS_HANDLERS[key.lower()](data, group, match.group('value'))
     
     return data
 
-def fetch_sitemap(sitemap_url):
+def robots_paths(robots_data, rule='disallow'):
+    # Visão achatada das regras de todos os agentes, sem repetições, montada só quando alguém lê
+    return list(dict.fromkeys(path for rules in robots_data['user_agents'].values() for path in rules[rule]))
+
+def fetch_sitemap(sitemap_url, cancelled=None):
+    # Retorna um stream para que o parse acompanhe o download
     try:
-        response = requests.get(sitemap_url, timeout=15)
+        request = SESSION.build_request('GET', sitemap_url, headers=_conditional_headers(sitemap_url))
+        response = SESSION.send(request, stream=True)
+        if response.status_code == 304:
+            response.close()
+            return _open_cached(sitemap_url)
         if response.status_code == 200:
-            return response.content
+            return io.BufferedReader(_CachingReader(sitemap_url, response, cancelled))
+        response.close()
         return None
     except Exception as e:
         st.warning(f"Erro ao acessar {sitemap_url}: {str(e)}")
         return None
 
-def parse_sitemap(content, original_url=None):
-    if not content:
+def _collect_sitemap(events, urls, sitemaps):
+    # Consome eventos 'end' do iterparse ou do XMLPullParser, liberando cada elemento já processado.
+    # URLs ficam em colunas (uma lista por campo), prontas para virar DataFrame sem um dict por registro
+    locs, lastmods, changefreqs, priorities = URL_COLUMNS(urls)
+    for _, elem in events:
+        if elem.tag == URL_TAG:
+            # Uma única passada pelos filhos em vez de uma busca por campo
+            children = {child.tag: child.text for child in elem}
+            locs.append(children.get(LOC_TAG))
+            lastmods.append(children.get(LASTMOD_TAG))
+            changefreqs.append(children.get(CHANGEFREQ_TAG))
+            priorities.append(children.get(PRIORITY_TAG))
+        else:
+            sitemaps.append(elem.findtext(LOC_TAG))
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+def _read_sitemap(source):
+    urls = {field: [] for field in SITEMAP_FIELDS}
+    sitemaps = []
+    
+    # Sitemaps .xml.gz chegam como arquivo gzip, sem Content-Encoding
+    if isinstance(source, bytes):
+        if source[:2] == GZIP_MAGIC:
+            source = gzip.decompress(source)
+        source = io.BytesIO(source)
+    elif source.peek(2)[:2] == GZIP_MAGIC:
+        source = gzip.GzipFile(fileobj=source)
+    
+    # Parsear de forma incremental, liberando cada elemento já processado.
+    # O modo tolerante do lxml cobre XML malformado sem precisar reler o stream
+    context = etree.iterparse(source, events=('end',), tag=(URL_TAG, SITEMAP_TAG), recover=True, huge_tree=True)
+    _collect_sitemap(context, urls, sitemaps)
+    
+    root_tag = context.root.tag if context.root is not None else None
+    return root_tag, urls, sitemaps
+
+def parse_sitemap(source, original_url=None):
+    if not source:
         return None
     
-    # Tentar parsear como XML
     try:
-        root = ET.fromstring(content)
-    except ET.ParseError:
-        try:
-            soup = BeautifulSoup(content, 'xml')
-            if soup.find('sitemapindex'):
-                sitemaps = [loc.text for loc in soup.find_all('loc')]
-                return {
-                    'type': 'index',
-                    'sitemaps': sitemaps,
-                    'source': original_url or 'Direct'
-                }
-            elif soup.find('urlset'):
-                urls = []
-                for url in soup.find_all('url'):
-                    url_data = {
-                        'loc': url.find('loc').text if url.find('loc') else None,
-                        'lastmod': url.find('lastmod').text if url.find('lastmod') else None,
-                        'changefreq': url.find('changefreq').text if url.find('changefreq') else None,
-                        'priority': url.find('priority').text if url.find('priority') else None
-                    }
-                    urls.append(url_data)
-                return {
-                    'type': 'regular',
-                    'urls': urls,
-                    'source': original_url or 'Direct'
-                }
-        except Exception as e:
-            st.warning(f"Erro ao analisar sitemap: {str(e)}")
-            return None
+        root_tag, urls, sitemaps = _read_sitemap(source)
+    except etree.XMLSyntaxError as e:
+        st.warning(f"Erro ao analisar sitemap: {str(e)}")
+        return None
     
-    # Parsear como sitemap regular
-    try:
-        namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        urls = []
-        
-        for url in root.findall('ns:url', namespace):
-            url_data = {
-                'loc': url.find('ns:loc', namespace).text if url.find('ns:loc', namespace) is not None else None,
-                'lastmod': url.find('ns:lastmod', namespace).text if url.find('ns:lastmod', namespace) is not None else None,
-                'changefreq': url.find('ns:changefreq', namespace).text if url.find('ns:changefreq', namespace) is not None else None,
-                'priority': url.find('ns:priority', namespace).text if url.find('ns:priority', namespace) is not None else None
-            }
-            urls.append(url_data)
-        
-        if urls:
-            return {
-                'type': 'regular',
-                'urls': urls,
-                'source': original_url or 'Direct'
-            }
-    except:
-        pass
+    return _sitemap_result(root_tag, urls, sitemaps, original_url)
+
+def _sitemap_result(root_tag, urls, sitemaps, original_url=None):
+    # O tipo vem da raiz do documento, não de quais elementos apareceram
+    if root_tag == URLSET_TAG and urls['loc']:
+        return {
+            'type': 'regular',
+            'urls': urls,
+            'source': original_url or 'Direct'
+        }
+    if root_tag == SITEMAPINDEX_TAG and sitemaps:
+        return {
+            'type': 'index',
+            'sitemaps': sitemaps,
+            'source': original_url or 'Direct'
+        }
     
     return None
 
-def get_all_sitemap_urls(sitemap_data):
-    all_urls = []
+@st.cache_data(ttl=CACHE_TTL, max_entries=128, show_spinner=False)
+def _load_sitemap(sitemap_url, _cancelled=None):
+    # _cancelled fica fora da chave do cache; uma sondagem abandonada levanta _ProbeCancelled,
+    # e exceções não são cacheadas, então o resultado não fica registrado como falha
+    stream = fetch_sitemap(sitemap_url, _cancelled)
+    if stream is None:
+        return time.time(), None
+    try:
+        with stream:
+            return time.time(), parse_sitemap(stream, sitemap_url)
+    except _ProbeCancelled:
+        raise
+    except Exception as e:
+        st.warning(f"Erro ao acessar {sitemap_url}: {str(e)}")
+        return time.time(), None
+
+def load_sitemap(sitemap_url, cancelled=None):
+    return _with_negative_ttl(_load_sitemap, sitemap_url, cancelled)
+
+def probe_sitemaps(sitemap_urls):
+    # Testa os candidatos em paralelo, mas respeita a ordem de preferência da lista:
+    # vence o primeiro candidato válido na ordem, não o que responder mais rápido
+    ctx = get_script_run_ctx()
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=5, initializer=add_script_run_ctx, initargs=(None, ctx))
+    futures = [executor.submit(load_sitemap, u, cancelled) for u in sitemap_urls]
+    try:
+        for sitemap_url, future in zip(sitemap_urls, futures):
+            sitemap_data = future.result()
+            if sitemap_data:
+                return sitemap_url, sitemap_data
+    finally:
+        # cancel_futures só alcança os que ainda estão na fila; os downloads em andamento
+        # param no próximo pedaço lido
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
     
+    return None, None
+
+async def _afetch_sitemap(client, url):
+    # Alimenta o parser com cada pedaço do corpo assim que ele chega, gravando a cópia no cache em disco
+    try:
+        request = client.build_request('GET', url, headers=_conditional_headers(url))
+        response = await client.send(request, stream=True)
+        try:
+            if response.status_code == 304:
+                return parse_sitemap(_read_cached(url), url)
+            if response.status_code != 200:
+                return None
+            
+            parser = etree.XMLPullParser(events=('end',), tag=(URL_TAG, SITEMAP_TAG), recover=True, huge_tree=True)
+            urls = {field: [] for field in SITEMAP_FIELDS}
+            sitemaps = []
+            cache = _CacheFile(url, response.headers)
+            decompressor = None
+            try:
+                async for chunk in response.aiter_bytes():
+                    cache.write(chunk)
+                    # Sitemaps .xml.gz chegam como arquivo gzip, sem Content-Encoding
+                    if decompressor is None:
+                        decompressor = zlib.decompressobj(wbits=31) if chunk[:2] == GZIP_MAGIC else False
+                    parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+                    _collect_sitemap(parser.read_events(), urls, sitemaps)
+                if decompressor:
+                    parser.feed(decompressor.flush())
+                cache.commit()
+            finally:
+                cache.discard()
+            
+            root = parser.close()
+            _collect_sitemap(parser.read_events(), urls, sitemaps)
+            return _sitemap_result(root.tag if root is not None else None, urls, sitemaps, url)
+        finally:
+            await response.aclose()
+    except Exception as e:
+        st.warning(f"Erro ao acessar {url}: {str(e)}")
+        return None
+
+async def _iter_shards(urls):
+    # Busca todos os sitemaps vinculados em paralelo e entrega cada um assim que chega
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=HTTP_LIMITS, retries=HTTP_RETRIES)
+    async with httpx.AsyncClient(transport=transport, headers=DEFAULT_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True) as client:
+        tasks = [asyncio.ensure_future(_afetch_sitemap(client, u)) for u in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                parsed = await next_done
+                if parsed and parsed['type'] == 'regular':
+                    yield parsed['urls']
+        finally:
+            # Quem consome parou (ex.: limite de URLs): cancelar o que ainda está pendente
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+def get_all_sitemap_urls(sitemap_data):
+    # Gera tuplas (loc, lastmod, changefreq, priority) sem montar uma lista única de dicts
     if sitemap_data['type'] == 'regular':
-        return sitemap_data['urls']
+        yield from zip(*URL_COLUMNS(sitemap_data['urls']))
     elif sitemap_data['type'] == 'index':
-        for sitemap_url in sitemap_data['sitemaps']:
-            content = fetch_sitemap(sitemap_url)
-            if content:
-                parsed = parse_sitemap(content, sitemap_url)
-                if parsed and parsed['type'] == 'regular':
-                    all_urls.extend(parsed['urls'])
-    
-    return all_urls
+        loop = asyncio.new_event_loop()
+        shards = _iter_shards(sitemap_data['sitemaps'])
+        try:
+            while True:
+                try:
+                    urls = loop.run_until_complete(shards.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield from zip(*URL_COLUMNS(urls))
+        finally:
+            loop.run_until_complete(shards.aclose())
+            loop.close()
+
+def _typed_frame(df):
+    df['priority'] = pd.to_numeric(df['priority'], errors='coerce')
+    return df.astype(SITEMAP_DTYPES)
+
+def sitemap_frame(urls):
+    # As colunas do parser entram direto, sem transpor registro a registro
+    return _typed_frame(pd.DataFrame(urls, columns=SITEMAP_FIELDS))
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=128, show_spinner=False)
+def _combined_sitemap_frame(shard_urls, max_urls):
+    # Chave pela lista de vinculados e pelo limite: reruns da interface não baixam os shards de novo
+    rows = get_all_sitemap_urls({'type': 'index', 'sitemaps': list(shard_urls)})
+    try:
+        df = _typed_frame(pd.DataFrame.from_records(rows, columns=SITEMAP_FIELDS, nrows=max_urls))
+    finally:
+        rows.close()
+    return time.time(), df if not df.empty else None
+
+def combined_sitemap_frame(sitemap_data, max_urls=200_000):
+    df = _with_negative_ttl(_combined_sitemap_frame, tuple(sitemap_data['sitemaps']), max_urls)
+    return df if df is not None else sitemap_frame({})
 
-def analyze_seo(robots_data, sitemap_data):
+def lastmod_dates(df):
+    # Formato fixo no parser vetorizado; datas W3C com hora usam só a parte da data.
+    # Com cache=True cada data distinta é convertida uma única vez
+    return pd.to_datetime(df['lastmod'].str[:10], format='%Y-%m-%d', errors='coerce', cache=True).dropna()
+
+def analyze_seo(robots_data, sitemap_data, df=None):
+    # df é o DataFrame que a interface já montou (do sitemap ou de todos os vinculados, no caso de index)
     recommendations = []
     warnings = []
     insights = []
     
     if robots_data:
-        important_paths = ['/css/', '/js/', '/img/', '/assets/']
-        for path in important_paths:
-            if any(path in disallowed for disallowed in robots_data['disallowed']):
+        blocked = {m.group(1) for disallowed in robots_paths(robots_data) for m in IMPORTANT_PATHS_RE.finditer(disallowed)}
+        for path in IMPORTANT_PATHS:
+            if path in blocked:
                 warnings.append(f"⚠️ Bloqueio potencialmente problemático: {path} (pode afetar renderização)")
         
         if not robots_data['sitemaps']:
@@ -200,27 +636,20 @@ def analyze_seo(robots_data, sitemap_data):
     
     if sitemap_data:
         if sitemap_data['type'] == 'regular':
-            urls = sitemap_data['urls']
-            insights.append(f"📊 URLs no sitemap principal: {len(urls)}")
+            if df is None:
+                df = sitemap_frame(sitemap_data['urls'])
+            insights.append(f"📊 URLs no sitemap principal: {len(df)}")
             
-            priorities = [float(url['priority']) for url in urls if url['priority']]
-            if priorities:
-                avg_priority = sum(priorities) / len(priorities)
-                insights.append(f"⚖️ Prioridade média: {avg_priority:.2f}")
+            if df['priority'].notna().any():
+                insights.append(f"⚖️ Prioridade média: {df['priority'].mean():.2f}")
             
-            lastmod_dates = [url['lastmod'] for url in urls if url['lastmod']]
-            if lastmod_dates:
-                try:
-                    dates = [datetime.strptime(d, '%Y-%m-%d') for d in lastmod_dates if d]
-                    oldest = min(dates).strftime('%Y-%m-%d')
-                    newest = max(dates).strftime('%Y-%m-%d')
-                    insights.append(f"📅 Datas de modificação: Mais antiga {oldest}, mais recente {newest}")
-                except:
-                    pass
+            dates = lastmod_dates(df)
+            if not dates.empty:
+                oldest, newest = dates.agg(['min', 'max'])
+                insights.append(f"📅 Datas de modificação: Mais antiga {oldest:%Y-%m-%d}, mais recente {newest:%Y-%m-%d}")
             
-            changefreqs = [url['changefreq'] for url in urls if url['changefreq']]
-            if changefreqs:
-                freq_counts = pd.Series(changefreqs).value_counts()
+            freq_counts = df['changefreq'].value_counts()
+            if not freq_counts.empty:
                 insights.append("🔄 Frequência de alterações:")
                 for freq, count in freq_counts.items():
                     insights.append(f"   - {freq}: {count} URLs")
@@ -228,16 +657,13 @@ def analyze_seo(robots_data, sitemap_data):
         elif sitemap_data['type'] == 'index':
             insights.append(f"📂 Sitemap index encontrado com {len(sitemap_data['sitemaps'])} sitemaps vinculados")
             
-            # Analisar todos os sitemaps vinculados
-            all_urls = get_all_sitemap_urls(sitemap_data)
-            if all_urls:
-                insights.append(f"🌐 Total de URLs em todos os sitemaps: {len(all_urls)}")
+            # Os vinculados só entram na análise se a interface já os buscou
+            if df is not None and not df.empty:
+                insights.append(f"🌐 Total de URLs em todos os sitemaps: {len(df)}")
                 
                 # Adicionar análise agregada
-                priorities = [float(url['priority']) for url in all_urls if url.get('priority')]
-                if priorities:
-                    avg_priority = sum(priorities) / len(priorities)
-                    insights.append(f"⚖️ Prioridade média combinada: {avg_priority:.2f}")
+                if df['priority'].notna().any():
+                    insights.append(f"⚖️ Prioridade média combinada: {df['priority'].mean():.2f}")
     
     return recommendations, warnings, insights
 
@@ -252,6 +678,7 @@ if url_input:
             # Processar robots.txt
             st.subheader("🔧 Análise do robots.txt")
             robots_content = fetch_robots_txt(url_input)
+            robots_data = None
             
             if robots_content:
                 robots_data = parse_robots_txt(robots_content)
@@ -266,21 +693,20 @@ if url_input:
                     with col2:
                         st.markdown("### 🔍 Insights")
                         
+                        # Cada lista vira um único elemento em vez de um st.write por item
                         st.markdown("**Agentes de usuário definidos:**")
-                        for ua in robots_data['user_agents']:
-                            st.write(f"- `{ua}`")
+                        st.markdown('\n'.join(f"- `{ua}`" for ua in robots_data['user_agents']))
                         
-                        if robots_data['disallowed']:
+                        disallowed = robots_paths(robots_data)
+                        if disallowed:
                             st.markdown("**Caminhos bloqueados:**")
-                            for path in robots_data['disallowed'][:10]:
-                                st.write(f"- `{path}`")
-                            if len(robots_data['disallowed']) > 10:
-                                st.write(f"... e mais {len(robots_data['disallowed']) - 10} caminhos")
+                            st.code('\n'.join(disallowed[:10]), language='text')
+                            if len(disallowed) > 10:
+                                st.write(f"... e mais {len(disallowed) - 10} caminhos")
                         
                         if robots_data['sitemaps']:
                             st.markdown("**Sitemaps encontrados:**")
-                            for sitemap in robots_data['sitemaps']:
-                                st.write(f"- [{sitemap}]({sitemap})")
+                            st.markdown('\n'.join(f"- [{sitemap}]({sitemap})" for sitemap in robots_data['sitemaps']))
                 else:
                     st.warning("Não foi possível analisar o robots.txt")
             else:
@@ -290,80 +716,70 @@ if url_input:
             st.subheader("🗺️ Análise do Sitemap.xml")
             
             # Tentar encontrar o sitemap
-            sitemap_urls = []
-            
             if robots_data and robots_data['sitemaps']:
-                sitemap_urls = robots_data['sitemaps']
+                # O primeiro sitemap declarado costuma ser o principal; os demais só são testados se ele falhar
+                sitemap_url, sitemap_data = probe_sitemaps(robots_data['sitemaps'][:1])
+                if not sitemap_data:
+                    sitemap_url, sitemap_data = probe_sitemaps(robots_data['sitemaps'][1:])
             else:
                 common_sitemaps = [
                     '/sitemap.xml',
                     '/sitemap_index.xml',
                     '/sitemap-index.xml',
                     '/sitemap1.xml',
-                    '/sitemap_1.xml'
+                    '/sitemap_1.xml',
+                    '/sitemap.xml.gz'
                 ]
-                for path in common_sitemaps:
-                    sitemap_urls.append(urljoin(url_input, path))
-            
-            sitemap_data = None
-            
-            for sitemap_url in sitemap_urls:
-                sitemap_content = fetch_sitemap(sitemap_url)
-                if sitemap_content:
-                    sitemap_data = parse_sitemap(sitemap_content, sitemap_url)
-                    if sitemap_data:
-                        st.success(f"Sitemap encontrado em: [{sitemap_url}]({sitemap_url})")
-                        break
+                sitemap_url, sitemap_data = probe_sitemaps([urljoin(url_input, path) for path in common_sitemaps])
             
+            # Montado uma única vez e reaproveitado pela análise combinada
+            sitemap_df = None
             if sitemap_data:
+                st.success(f"Sitemap encontrado em: [{sitemap_url}]({sitemap_url})")
+                
                 if sitemap_data['type'] == 'regular':
-                    st.markdown(f"**Tipo:** Sitemap regular com {len(sitemap_data['urls'])} URLs")
+                    sitemap_df = sitemap_frame(sitemap_data['urls'])
+                    st.markdown(f"**Tipo:** Sitemap regular com {len(sitemap_df)} URLs")
                     
+                    # Amostra renderizada como uma única tabela Arrow
                     st.markdown("**Algumas URLs do sitemap:**")
-                    sample_urls = sitemap_data['urls'][:5]
-                    for url in sample_urls:
-                        st.write(f"- [{url['loc']}]({url['loc']})")
-                    if len(sitemap_data['urls']) > 5:
-                        st.write(f"... e mais {len(sitemap_data['urls']) - 5} URLs")
+                    st.dataframe(sitemap_df.head(50), hide_index=True, column_config={'loc': st.column_config.LinkColumn()})
+                    if len(sitemap_df) > 50:
+                        st.write(f"... e mais {len(sitemap_df) - 50} URLs")
                     
-                    df = pd.DataFrame(sitemap_data['urls'])
-                    
-                    if 'priority' in df.columns and not df['priority'].isnull().all():
+                    if 'priority' in sitemap_df.columns and not sitemap_df['priority'].isnull().all():
                         st.markdown("**Distribuição de prioridades:**")
-                        st.bar_chart(df['priority'].value_counts())
+                        st.bar_chart(sitemap_df['priority'].value_counts())
                     
-                    if 'changefreq' in df.columns and not df['changefreq'].isnull().all():
+                    if 'changefreq' in sitemap_df.columns and not sitemap_df['changefreq'].isnull().all():
                         st.markdown("**Frequência de alterações:**")
-                        st.bar_chart(df['changefreq'].value_counts())
+                        st.bar_chart(sitemap_df['changefreq'].value_counts())
                 
                 elif sitemap_data['type'] == 'index':
                     st.markdown(f"**Tipo:** Sitemap index com {len(sitemap_data['sitemaps'])} sitemaps vinculados")
                     st.markdown("**Sitemaps listados:**")
-                    for sitemap in sitemap_data['sitemaps'][:5]:
-                        st.write(f"- [{sitemap}]({sitemap})")
+                    st.markdown('\n'.join(f"- [{sitemap}]({sitemap})" for sitemap in sitemap_data['sitemaps'][:5]))
                     if len(sitemap_data['sitemaps']) > 5:
                         st.write(f"... e mais {len(sitemap_data['sitemaps']) - 5} sitemaps")
                     
-                    # Mostrar análise combinada dos sitemaps vinculados
-                    with st.expander("🔍 Ver análise detalhada de todos os sitemaps"):
-                        all_urls = get_all_sitemap_urls(sitemap_data)
-                        if all_urls:
-                            st.markdown(f"**Total de URLs encontradas em todos os sitemaps:** {len(all_urls)}")
-                            
-                            # Criar dataframe combinado
-                            combined_df = pd.DataFrame(all_urls)
+                    # Os sitemaps vinculados só são baixados quando o usuário pede; a busca é feita
+                    # uma única vez para a interface e a análise
+                    if st.checkbox("🔍 Analisar todos os sitemaps vinculados"):
+                        sitemap_df = combined_sitemap_frame(sitemap_data, max_urls)
+                        
+                        if not sitemap_df.empty:
+                            st.markdown(f"**Total de URLs encontradas em todos os sitemaps:** {len(sitemap_df)}")
+                            if len(sitemap_df) >= max_urls:
+                                st.caption(f"Análise interrompida ao atingir o limite de {max_urls:,} URLs")
                             
-                            if 'priority' in combined_df.columns and not combined_df['priority'].isnull().all():
+                            if 'priority' in sitemap_df.columns and not sitemap_df['priority'].isnull().all():
                                 st.markdown("**Distribuição combinada de prioridades:**")
-                                st.bar_chart(combined_df['priority'].value_counts())
+                                st.bar_chart(sitemap_df['priority'].value_counts())
                             
-                            if 'lastmod' in combined_df.columns and not combined_df['lastmod'].isnull().all():
-                                try:
-                                    combined_df['lastmod_date'] = pd.to_datetime(combined_df['lastmod'])
-                                    st.markdown("**Distribuição temporal das atualizações:**")
-                                    st.line_chart(combined_df['lastmod_date'].value_counts().sort_index())
-                                except:
-                                    pass
+                            dates = lastmod_dates(sitemap_df)
+                            if not dates.empty:
+                                st.markdown("**Distribuição temporal das atualizações:**")
+                                st.line_chart(dates.value_counts().sort_index())
             else:
                 st.warning("Não foi possível encontrar ou analisar nenhum sitemap")
             
@@ -371,22 +787,20 @@ if url_input:
             st.subheader("📊 Análise Combinada e Recomendações")
             
             if robots_data or sitemap_data:
-                recommendations, warnings, insights = analyze_seo(robots_data, sitemap_data)
+                recommendations, warnings, insights = analyze_seo(robots_data, sitemap_data, df=sitemap_df)
                 
+                # Um bloco por seção em vez de uma mensagem por item
                 if warnings:
                     st.markdown("### ⚠️ Possíveis Problemas")
-                    for warning in warnings:
-                        st.warning(warning)
+                    st.warning('\n\n'.join(warnings))
                 
                 if insights:
                     st.markdown("### 🔍 Insights")
-                    for insight in insights:
-                        st.info(insight)
+                    st.info('\n\n'.join(insights))
                 
                 if recommendations:
                     st.markdown("### ✅ Recomendações")
-                    for rec in recommendations:
-                        st.success(rec)
+                    st.success('\n\n'.join(recommendations))
             else:
                 st.warning("Dados insuficientes para análise combinada")
 else: